@@ -150,8 +150,8 @@ class DiscordBot(commands.Bot):
 
 
 if __name__ == "__main__":
-    from src.types.config import Config
+    from src.types.config import get_config
 
-    config = Config()
+    config = get_config()
     bot = DiscordBot()
     bot.run(token=config.discord_bot_token)
@@ -7,14 +7,14 @@ import discord
 from discord.ext import commands
 
 from src.sdk.llm import LLMServices
-from src.types.config import Config
+from src.types.config import get_config
 
 
 class ImageGeneratorCogs(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.config = Config()
-        self.llm_services = LLMServices()
+        self.config = get_config()
+        self.llm_services = LLMServices.shared()
 
     @commands.command()
     async def graph(self, ctx: commands.Context, *, prompt: str) -> None:
@@ -11,7 +11,7 @@ from src.sdk.llm import LLMServices
 class ReplyGeneratorCogs(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.llm_services = LLMServices()
+        self.llm_services = LLMServices.shared()
 
     async def _get_attachment_list(self, message: Message) -> list[str]:
         image_urls = []
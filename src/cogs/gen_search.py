@@ -6,7 +6,7 @@ from src.sdk.llm import LLMServices
 class WebSearchCogs(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.llm_services = LLMServices()
+        self.llm_services = LLMServices.shared()
 
     @commands.command()
     async def search(self, ctx: commands.Context, *, prompt: str) -> None:
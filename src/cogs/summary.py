@@ -1,7 +1,21 @@
+import re
+import time
+from string import Template
+from typing import NamedTuple
+import asyncio
+from datetime import datetime, timedelta
+import operator
+import functools
+import itertools
+from collections import OrderedDict, deque
+
 import discord
+import logfire
+import tiktoken
 from discord.ext import commands
 
 from src.sdk.llm import LLMServices
+from src.sdk.cache import SummaryCache
 
 SUMMARY_PROMPT = """
 請將總結的部分以發送者當作主要分類，並將他在這段期間內發送的內容總結。
@@ -19,21 +33,179 @@ Toudou:
 在總結的最後，請將這些內容整合成一個易懂的重點總結。
 """
 
+SUMMARY_PROMPT_CACHE_KEY = "summary_sys_v1"
+
+# 總結時略過呼叫本指令的訊息
+COMMAND_PREFIX = "!sum"
+COMMAND_PREFIX_LEN = len(COMMAND_PREFIX)
+
+# 略過開頭的 mention 後，第一個 token：訊息數量或其他無法解析的內容
+ARGS_PATTERN = re.compile(r"\s*(?:<@!?\d+>\s*)*(?:(?P<count>\d+)(?!\S)|(?P<other>\S+))?")
+MENTION_PATTERN = re.compile(r"<@!?(\d+)>")
+
+# 指定用戶時的掃描上限：history_count * SCAN_FACTOR 筆（至少 MIN_SCAN_LIMIT 筆）及 SCAN_TIMEOUT 秒
+SCAN_FACTOR = 50
+MIN_SCAN_LIMIT = 500
+SCAN_TIMEOUT = 10.0
+# 指定用戶時先掃描這段期間內的訊息；由新到舊翻頁時 discord.py 在用戶端比對 after，
+# 遇到超出期間的訊息便停止翻頁。期間內的訊息不足時，再往更早的訊息繼續掃描
+SCAN_WINDOW = timedelta(days=14)
+
+# Discord 單則訊息的字數上限，以及串流時編輯訊息的最短間隔（秒）
+DISCORD_MESSAGE_LIMIT = 2000
+STREAM_EDIT_INTERVAL = 0.5
+EMPTY_SUMMARY_MESSAGE = "無有效回應，請稍後再試。"
+
+# 整個請求（system prompt 與總結訊息）的 token 預算；超出的較早訊息改由較便宜的模型先行摘要
+INPUT_TOKEN_BUDGET = 6000
+OVERFLOW_MODEL = "gpt-4o-mini"
+# 先行摘要的長度上限，切分訊息時預留這些 token 給摘要本身
+OVERFLOW_SUMMARY_TOKENS = 500
+OVERFLOW_SUMMARY_HEADER = "先前對話摘要："
+OVERFLOW_MESSAGE = """
+以下是較早的對話紀錄，請依發送者條列重點，作為後續總結的背景：
+{chat_history_string}
+"""
+
 SUMMARY_MESSAGE = """
 總結以下 {history_count} 則消息：
 {chat_history_string}
 """
+# 在載入時預先轉成 string.Template，避免每次呼叫都重新解析 str.format 的格式字串
+SUMMARY_TEMPLATE = Template(
+    SUMMARY_MESSAGE.replace("{history_count}", "$history_count").replace(
+        "{chat_history_string}", "$chat_history_string"
+    )
+)
+
+# 依 bool(embeds) + bool(attachments) * 2 取得內文前綴，embed 優先於附件
+CONTENT_PREFIXES = ("", "嵌入內容: ", "附件: ", "嵌入內容: ")
+
+# 一次取出格式化訊息所需的欄位，省去逐一查找屬性
+_MESSAGE_FIELDS = operator.attrgetter("content", "embeds", "attachments", "author.name")
+
+# 以 (訊息 id, 編輯時間, embed 數量, 作者名稱) 快取已格式化的訊息
+# Discord 補上連結預覽或用戶改名時不會更新編輯時間，因此一併納入 key，避免使用過期的結果
+FORMATTED_MESSAGES_MAXSIZE = 4096
+_FORMATTED_MESSAGES: OrderedDict[
+    tuple[int, datetime | None, int, str], tuple[str, tuple[str, ...]]
+] = OrderedDict()
+
+
+class PendingSummary(NamedTuple):
+    """A summary request whose prompt is ready but that still needs an LLM call."""
+
+    prompt: str
+    attachments: list[str]
+    cache_key: str
+    scope: tuple[int, int | None, int, int]
+    embedding: list[float] | None
+
+
+class _CharEncoding:
+    """Counts one token per character, which roughly overestimates the tokens of chat text."""
+
+    def encode(self, text: str) -> list[str]:
+        return list(text)
+
+
+@functools.cache
+def _get_encoding() -> tiktoken.Encoding | _CharEncoding:
+    """Returns the tokenizer of OVERFLOW_MODEL, or counts characters if it cannot be loaded.
+
+    tiktoken downloads the BPE file on first use, so this blocks and should be warmed in a
+    thread. A failed load falls back to character counts for the rest of the process.
+    """
+    try:
+        return tiktoken.encoding_for_model(OVERFLOW_MODEL)
+    except Exception as e:
+        logfire.warn("Token encoding unavailable, counting characters instead", error=str(e))
+        return _CharEncoding()
+
+
+@functools.cache
+def _history_token_budget() -> int:
+    """Returns the tokens left for chat history after the static prompt parts.
+
+    SUMMARY_PROMPT and the fixed text of SUMMARY_MESSAGE never change, so they are tokenized
+    only once per process.
+    """
+    static_text = SUMMARY_PROMPT + SUMMARY_TEMPLATE.substitute(
+        history_count="", chat_history_string=""
+    )
+    return INPUT_TOKEN_BUDGET - len(_get_encoding().encode(static_text))
+
+
+def _split_by_token_budget(lines: list[str], budget_tokens: int) -> tuple[list[str], list[str]]:
+    """Splits chat history lines into an older overflow part and the newest lines within budget.
+
+    The newest line is always kept so that the overflow part shrinks on every split.
+
+    Args:
+        lines (list[str]): The chat history lines, ordered from oldest to newest.
+        budget_tokens (int): The maximum number of tokens of the kept lines.
+
+    Returns:
+        tuple[list[str], list[str]]: The overflow lines and the kept lines, both oldest first.
+    """
+    encoding = _get_encoding()
+    used = 0
+    for index in range(len(lines) - 1, -1, -1):
+        used += len(encoding.encode(lines[index])) + 1
+        if used > budget_tokens:
+            split = min(index + 1, len(lines) - 1)
+            return lines[:split], lines[split:]
+    return [], lines
+
+
+def _format_message(msg: discord.Message) -> tuple[str, tuple[str, ...]]:
+    """Formats a message as one chat history line and extracts its references in a single pass.
+
+    The references are the embed descriptions of the message, or its attachment URLs if it has
+    no embed, and replace its content in the line. Results are memoized by message id, edit
+    time, embed count and author name, so re-summarizing overlapping windows reuses the messages
+    formatted before.
+    """
+    content, embeds, attachments, author_name = _MESSAGE_FIELDS(msg)
+    key = (msg.id, msg.edited_at, len(embeds), author_name)
+    formatted = _FORMATTED_MESSAGES.get(key)
+    if formatted is not None:
+        _FORMATTED_MESSAGES.move_to_end(key)
+        return formatted
+
+    if embeds:
+        references = tuple(embed.description for embed in embeds if embed.description)
+    else:
+        references = tuple(att.url for att in attachments)
+    prefix = CONTENT_PREFIXES[bool(embeds) + bool(attachments) * 2]
+    body = ", ".join(references) if prefix else content
+    formatted = (f"{author_name}: {prefix}{body}", references)
+    _FORMATTED_MESSAGES[key] = formatted
+    if len(_FORMATTED_MESSAGES) > FORMATTED_MESSAGES_MAXSIZE:
+        _FORMATTED_MESSAGES.popitem(last=False)
+    return formatted
 
 
 class MessageFetcher(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.llm_services = LLMServices(system_prompt=SUMMARY_PROMPT)
+        # SUMMARY_PROMPT 保持固定不變，讓 system prompt 能命中供應商的 prompt cache
+        self.llm_services = LLMServices.shared().with_system(
+            SUMMARY_PROMPT, prompt_cache_key=SUMMARY_PROMPT_CACHE_KEY
+        )
+        self.overflow_llm_services = self.llm_services.model_copy(
+            update={"llm_model": OVERFLOW_MODEL}
+        )
+        self.summary_cache = SummaryCache(maxsize=512, threshold=0.95)
+
+    async def cog_load(self) -> None:
+        # 首次載入 tokenizer 會同步下載檔案，在執行緒中預先載入，避免卡住 event loop
+        await asyncio.to_thread(_history_token_budget)
 
     @commands.command()
     async def sum(self, ctx: commands.Context, *, prompt: str = "") -> None:
-        """Summarizes the most recent N messages in the current channel. If a user is specified,
-        only summarizes the most recent N messages from that user.
+        """Summarizes the most recent N messages in the current channel. If users are specified,
+        summarizes the most recent N messages of each user concurrently.
 
         Args:
             ctx (commands.Context): The context in which the command was called.
@@ -46,138 +218,286 @@ class MessageFetcher(commands.Cog):
             Exception: If an error occurs during the summarization process.
 
         Example:
-            !sum 10 @username
+            !sum 10 @username @another_user
                 If no number is provided, the default is 20.
         """
         try:
             # 1. 解析使用者輸入
-            history_count, target_user = self._parse_args(ctx, prompt)
+            history_count, target_users = await self._parse_args(ctx, prompt)
 
-            # 2. 從頻道抓取對應的歷史訊息
-            messages = await self._fetch_messages(ctx.channel, history_count, target_user)
+            # 2. 每位指定用戶（或整個頻道）的總結互不相依，同時進行並各自以串流回傳
+            await asyncio.gather(*[
+                self._summarize(ctx, history_count, target_user)
+                for target_user in target_users or [None]
+            ])
 
-            if not messages:
-                if target_user:
-                    await ctx.send(f"在此頻道中找不到 {target_user.mention} 的相關訊息。")
-                else:
-                    await ctx.send("此頻道沒有可供總結的訊息。")
-                return
+        except Exception as e:
+            # 錯誤處理
+            await ctx.send(f"發生錯誤：{e}")
 
-            # 3. 整理訊息成文字
-            chat_history_string, attachments = self._format_messages(messages)
+    async def _summarize(
+        self, ctx: commands.Context, history_count: int, target_user: discord.User | None
+    ) -> None:
+        """Summarizes the current channel, optionally for a single user, and sends the summary.
 
-            # 4. 建立要給模型的最終 Prompt
-            final_prompt = self._create_summary_prompt(history_count, chat_history_string)
+        Args:
+            ctx (commands.Context): The context in which the command was called.
+            history_count (int): The number of historical messages to summarize.
+            target_user (discord.User | None): The user whose messages to summarize.
+        """
+        request = await self._prepare_summary(ctx, history_count, target_user)
+        if request is not None:
+            await self._complete_summary(ctx, request)
 
-            # 5. 呼叫 LLM 進行總結
-            summary = await self._call_llm(final_prompt, attachments)
+    async def _prepare_summary(
+        self, ctx: commands.Context, history_count: int, target_user: discord.User | None
+    ) -> PendingSummary | None:
+        """Builds the summary prompt of the current channel, optionally for a single user.
 
-            # 6. 回傳總結結果
-            await ctx.send(summary)
+        Cached summaries and empty channels are answered right away.
 
+        Args:
+            ctx (commands.Context): The context in which the command was called.
+            history_count (int): The number of historical messages to summarize.
+            target_user (discord.User | None): The user whose messages to summarize.
+
+        Returns:
+            PendingSummary | None: The request to send to the LLM, or None if already answered.
+        """
+        channel = ctx.channel
+
+        # 1. 從頻道抓取對應的歷史訊息
+        messages = await self._fetch_messages(channel, history_count, target_user)
+
+        if not messages:
+            if target_user:
+                await ctx.send(f"在此頻道中找不到 {target_user.mention} 的相關訊息。")
+            else:
+                await ctx.send("此頻道沒有可供總結的訊息。")
+            return None
+
+        # 2. 相同參數且訊息與編輯狀態完全相同時直接使用快取
+        # 語意相近的快取只在最新訊息相同時共用；有新訊息時舊總結缺少新內容，不能當作命中
+        scope = (
+            channel.id,
+            target_user.id if target_user else None,
+            history_count,
+            messages[-1].id,
+        )
+        cache_key = self.summary_cache.make_key(
+            *scope, *[(msg.id, msg.edited_at) for msg in messages]
+        )
+        summary = self.summary_cache.get(cache_key)
+        if summary is not None:
+            await self._send_summary(ctx, summary)
+            return None
+
+        # 3. 整理訊息成文字，超過 token 預算時將較早的訊息先濃縮成摘要
+        chat_history, attachments = self._format_messages(messages)
+        chat_history_string = await self._fit_token_budget(chat_history)
+
+        # 4. 建立要給模型的最終 Prompt
+        final_prompt = self._create_summary_prompt(history_count, chat_history_string)
+
+        # 5. 只有同一範圍內已有快取時才先取得 embedding 比對語意相近的 Prompt（例如只差在編輯）
+        embedding = None
+        if self.summary_cache.has_scope(scope):
+            embedding = await self._get_embedding(final_prompt)
+            summary = self.summary_cache.search(embedding, scope=scope) if embedding else None
+            if summary is not None:
+                await self._send_summary(ctx, summary)
+                return None
+        return PendingSummary(final_prompt, attachments, cache_key, scope, embedding)
+
+    async def _complete_summary(self, ctx: commands.Context, request: PendingSummary) -> None:
+        """Streams the LLM summary of a prepared request into Discord and caches it.
+
+        Args:
+            ctx (commands.Context): The context in which the command was called.
+            request (PendingSummary): The prepared summary request.
+        """
+        summary = await self._stream_llm(ctx, request.prompt, request.attachments)
+        # 空白的回應不寫入快取，避免之後相同的請求一直命中空結果
+        if not summary or not summary.strip():
+            return
+        # 總結已經送出後才取得 embedding，不增加使用者等待的時間
+        embedding = request.embedding or await self._get_embedding(request.prompt)
+        self.summary_cache.put(request.cache_key, embedding, summary, scope=request.scope)
+
+    async def _get_embedding(self, prompt: str) -> list[float] | None:
+        """Returns the embedding of a prompt, or None if the embedding call fails.
+
+        The cache is best-effort, so a failure only skips the near-hit lookup.
+        """
+        try:
+            return await self.llm_services.get_embedding(prompt)
         except Exception as e:
-            # 錯誤處理
-            await ctx.send(f"發生錯誤：{e}")
+            logfire.warn("Summary embedding failed", error=str(e))
+            return None
 
-    def _parse_args(self, ctx: commands.Context, prompt: str) -> tuple[int, discord.User | None]:
-        """Parses the user-provided arguments and returns a tuple containing the history count and the target user.
+    async def _parse_args(
+        self, ctx: commands.Context, prompt: str
+    ) -> tuple[int, list[discord.User]]:
+        """Parses the user-provided arguments and returns a tuple containing the history count and the target users.
 
         Args:
             ctx (commands.Context): The context in which the command was invoked.
             prompt (str): The user-provided arguments as a string.
 
         Returns:
-            tuple[int, discord.User | None]: A tuple containing the history count (int) and the target user (discord.User or None).
+            tuple[int, list[discord.User]]: A tuple containing the history count (int) and the mentioned users (list[discord.User]).
         """
-        args = prompt.strip().split()
         history_count = 20
-        target_user = None
-
-        if args:
-            # 試著解析第一個參數為整數
-            try:
-                history_count = int(args[0])
-                # 若還有剩餘參數，嘗試取得 mentioned_user
-                if len(args) > 1 and ctx.message.mentions:
-                    target_user = ctx.message.mentions[0]
-            except ValueError:
-                # 第一個參數不是數字時
-                ctx.send("你輸入的不是數字，將自動總結最近 20 則消息。")
-                if ctx.message.mentions:
-                    target_user = ctx.message.mentions[0]
-        return history_count, target_user
+        # 只採用指令參數中實際出現的 mention；回覆訊息時 Discord 會把被回覆者也放進 mentions
+        mentions = {user.id: user for user in ctx.message.mentions}
+        mentioned_ids = dict.fromkeys(int(user_id) for user_id in MENTION_PATTERN.findall(prompt))
+        target_users = [mentions[user_id] for user_id in mentioned_ids if user_id in mentions]
+
+        # 數字可以放在 mention 前後，其餘情況提示使用者並使用預設值
+        match = ARGS_PATTERN.match(prompt)
+        if match["count"]:
+            history_count = int(match["count"])
+        elif match["other"]:
+            await ctx.send("你輸入的不是數字，將自動總結最近 20 則消息。")
+        return history_count, target_users
 
     async def _fetch_messages(
-        self, channel: discord.TextChannel, history_count: int, target_user: discord.User | None
+        self,
+        channel: discord.TextChannel,
+        history_count: int,
+        target_user: discord.User | None,
+        since: timedelta | None = SCAN_WINDOW,
     ) -> list[discord.Message]:
         """Fetches the most recent N messages from a Discord channel and filters them by user if specified.
 
+        When filtering by user, messages within the time window are scanned first, and older
+        messages only if the window holds fewer than N. The whole scan is bounded by a message
+        count and a wall-clock timeout, so fewer than N messages may be returned for users who
+        rarely post.
+
         Args:
             channel (discord.TextChannel): The Discord channel from which to fetch messages.
             history_count (int): The number of historical messages to fetch.
             target_user (discord.User | None): The user whose messages to filter by.
+            since (timedelta | None, optional): Scan messages newer than this first when filtering by user.
+                Pass None to scan without a time window. Defaults to SCAN_WINDOW.
 
         Returns:
             list[discord.Message]: A list of Discord message objects.
         """
-        messages = []
         if target_user:
-            # 從最舊到最新，過濾出指定用戶訊息
-            async for msg in channel.history(limit=None):
-                if (
-                    msg.author.id == target_user.id
-                    and not msg.author.bot
-                    and not msg.content.startswith("!sum")
-                ):
-                    messages.append(msg)
-                    if len(messages) == history_count:
-                        break
-        else:
-            # 直接抓取最近的 history_count 筆
-            async for msg in channel.history(limit=history_count):
-                if not msg.author.bot and not msg.content.startswith("!sum"):
-                    messages.append(msg)
+            return await self._fetch_user_messages(channel, history_count, target_user, since)
+
+        # 直接抓取最近的 history_count 筆，同樣從左側插入以維持由舊到新的順序
+        messages: deque[discord.Message] = deque(maxlen=history_count)
+        async for msg in channel.history(limit=history_count, oldest_first=False):
+            if msg.author.bot or msg.content[:COMMAND_PREFIX_LEN] == COMMAND_PREFIX:
+                continue
+            messages.appendleft(msg)
+        return list(messages)
+
+    async def _fetch_user_messages(
+        self,
+        channel: discord.TextChannel,
+        history_count: int,
+        target_user: discord.User,
+        since: timedelta | None,
+    ) -> list[discord.Message]:
+        """Scans the channel from newest to oldest for the most recent N messages of a user.
 
-        # 依照訊息時間做排序（由舊到新）
-        messages.reverse()
-        return messages
+        Args:
+            channel (discord.TextChannel): The Discord channel from which to fetch messages.
+            history_count (int): The number of historical messages to fetch.
+            target_user (discord.User): The user whose messages to collect.
+            since (timedelta | None): Scan messages newer than this first, or None for no time window.
 
-    def _format_messages(self, messages: list[discord.Message]) -> tuple[str, list[str]]:
-        """Formats a list of Discord messages into a string and extracts embed descriptions or attachment URLs.
+        Returns:
+            list[discord.Message]: The collected messages, oldest first.
+        """
+        # 從最新到最舊，過濾出指定用戶訊息；掃描筆數與時間皆設上限，避免走訪整個頻道
+        scan_cap = max(history_count * SCAN_FACTOR, MIN_SCAN_LIMIT)
+        deadline = time.monotonic() + SCAN_TIMEOUT
+        target_id = target_user.id
+        # 先掃描期間內的訊息，不足時接著掃描期間之前的訊息，兩段共用掃描筆數與時間上限
+        window_start = discord.utils.utcnow() - since if since else None
+        windows = [(window_start, None), (None, window_start)] if window_start else [(None, None)]
+        scanned = 0
+        # 由新到舊走訪時從左側插入，結果自然是由舊到新
+        collected: deque[discord.Message] = deque(maxlen=history_count)
+        for after, before in windows:
+            async for msg in channel.history(
+                limit=scan_cap - scanned, after=after, before=before, oldest_first=False
+            ):
+                scanned += 1
+                if time.monotonic() > deadline:
+                    break
+                if msg.author.bot or msg.content[:COMMAND_PREFIX_LEN] == COMMAND_PREFIX:
+                    continue
+                if msg.author.id == target_id:
+                    collected.appendleft(msg)
+                    if len(collected) == history_count:
+                        break
+            if (
+                len(collected) == history_count
+                or scanned >= scan_cap
+                or time.monotonic() > deadline
+            ):
+                break
+        return list(collected)
+
+    def _format_messages(self, messages: list[discord.Message]) -> tuple[list[str], list[str]]:
+        """Formats a list of Discord messages into text and extracts embed descriptions or attachment URLs.
 
         Args:
             messages (list[discord.Message]): A list of Discord message objects to be formatted.
 
         Returns:
-            tuple[str, list[str]]: A tuple containing:
-                - chat_history_string (str): A string containing the text of all messages.
-                - attachments (list[str]): A list of all links or descriptions that can be used as references.
+            tuple[list[str], list[str]]: A tuple containing:
+                - chat_history (list[str]): The formatted text of each message, oldest first.
+                - attachments (list[str]): A list of all unique links or descriptions that can be used as references.
         """
-        chat_history_lines = []
-        attachments = []
-
-        for msg in messages:
-            content_text = msg.content
+        # 每則訊息只走訪一次，同時取得內文與參考資料（embed 描述或附件 URL）
+        formatted = [_format_message(msg) for msg in messages]
+        chat_history = [line for line, _ in formatted]
+        # 重複的參考資料只傳給 LLM 一次，並保留第一次出現的順序
+        attachments = list(
+            dict.fromkeys(itertools.chain.from_iterable(refs for _, refs in formatted))
+        )
+        return chat_history, attachments
 
-            if msg.embeds:
-                # 取出 embed 的描述
-                embed_descriptions = [
-                    embed.description for embed in msg.embeds if embed.description
-                ]
-                # 當作參考資料
-                attachments.extend(embed_descriptions)
-                content_text = "嵌入內容: " + ", ".join(embed_descriptions)
+    async def _fit_token_budget(self, chat_history: list[str]) -> str:
+        """Keeps the newest chat history within the token budget, condensing older messages.
 
-            elif msg.attachments:
-                # 取出附件 URL
-                attachment_urls = [att.url for att in msg.attachments]
-                attachments.extend(attachment_urls)
-                content_text = "附件: " + ", ".join(attachment_urls)
+        Whole messages that do not fit are summarized recursively by OVERFLOW_MODEL in at most
+        OVERFLOW_SUMMARY_TOKENS tokens, and the summary is prepended to the newest messages.
+        Room for the summary is reserved when splitting, so the result stays within budget
+        unless the newest message alone exceeds it.
 
-            chat_history_lines.append(f"{msg.author.name}: {content_text}")
+        Args:
+            chat_history (list[str]): The formatted messages, oldest first.
 
-        chat_history_string = "\n".join(chat_history_lines)
-        return chat_history_string, attachments
+        Returns:
+            str: The chat history that fits in the token budget.
+        """
+        chat_history_string = "\n".join(chat_history)
+        budget_tokens = _history_token_budget()
+        encoding = _get_encoding()
+        if len(encoding.encode(chat_history_string)) <= budget_tokens:
+            return chat_history_string
+
+        reserved_tokens = (
+            OVERFLOW_SUMMARY_TOKENS + len(encoding.encode(OVERFLOW_SUMMARY_HEADER)) + 2
+        )
+        overflow, kept = _split_by_token_budget(chat_history, budget_tokens - reserved_tokens)
+        if not overflow:
+            return chat_history_string
+        earlier_history = await self._fit_token_budget(overflow)
+        response = await self.overflow_llm_services.get_oai_reply(
+            prompt=OVERFLOW_MESSAGE.format(chat_history_string=earlier_history),
+            max_tokens=OVERFLOW_SUMMARY_TOKENS,
+        )
+        earlier_summary = response.choices[0].message.content or ""
+        return "\n".join([f"{OVERFLOW_SUMMARY_HEADER}\n{earlier_summary}", *kept])
 
     def _create_summary_prompt(self, history_count: int, chat_history_string: str) -> str:
         """Creates a summary prompt based on the SUMMARY_MESSAGE template.
@@ -189,23 +509,79 @@ class MessageFetcher(commands.Cog):
         Returns:
             str: The formatted summary prompt.
         """
-        return SUMMARY_MESSAGE.format(
+        return SUMMARY_TEMPLATE.substitute(
             history_count=history_count, chat_history_string=chat_history_string
         )
 
-    async def _call_llm(self, prompt: str, attachments: list[str]) -> str:
-        """Asynchronously calls the LLM (Language Learning Model) to summarize a message.
+    async def _send_summary(self, ctx: commands.Context, summary: str | None) -> None:
+        """Sends a complete summary, split into messages that fit the Discord length limit.
+
+        Args:
+            ctx (commands.Context): The context in which the command was called.
+            summary (str | None): The summary to send. A notice is sent instead if it is empty.
+        """
+        if not summary or not summary.strip():
+            await ctx.send(EMPTY_SUMMARY_MESSAGE)
+            return
+        for start in range(0, len(summary), DISCORD_MESSAGE_LIMIT):
+            await ctx.send(summary[start : start + DISCORD_MESSAGE_LIMIT])
+
+    async def _stream_llm(self, ctx: commands.Context, prompt: str, attachments: list[str]) -> str:
+        """Streams the LLM summary into Discord, editing the reply as tokens arrive.
+
+        The reply is edited at most once every STREAM_EDIT_INTERVAL seconds, and continues in a
+        new message whenever it would exceed the Discord length limit.
 
         Args:
+            ctx (commands.Context): The context in which the command was called.
             prompt (str): The prompt or message to be summarized.
             attachments (list[str]): A list of URLs pointing to images, videos, or embedded description links that can be referenced.
 
         Returns:
-            str: The summarized content returned by the LLM.
+            str: The full summarized content returned by the LLM.
+        """
+        msg = await ctx.send("總結中...")
+        chunks: list[str] = []
+        offset = 0  # 目前這則訊息的內容在完整總結中的起始位置
+        last_edit = time.monotonic()
+
+        async for res in self.llm_services.get_oai_reply_stream(
+            prompt=prompt, image_urls=attachments
+        ):
+            chunks.append(res.choices[0].delta.content or "")
+            if time.monotonic() - last_edit >= STREAM_EDIT_INTERVAL:
+                msg, offset = await self._render_stream(ctx, msg, "".join(chunks), offset)
+                last_edit = time.monotonic()
+
+        # 確保最終訊息完整
+        summary = "".join(chunks)
+        if not summary.strip():
+            await msg.edit(content=EMPTY_SUMMARY_MESSAGE)
+            return summary
+        await self._render_stream(ctx, msg, summary, offset)
+        return summary
+
+    async def _render_stream(
+        self, ctx: commands.Context, msg: discord.Message, text: str, offset: int
+    ) -> tuple[discord.Message, int]:
+        """Shows the streamed text from offset in msg, opening new messages when it overflows.
+
+        Args:
+            ctx (commands.Context): The context in which the command was called.
+            msg (discord.Message): The message currently being edited.
+            text (str): The text streamed so far.
+            offset (int): The position in text where msg starts.
+
+        Returns:
+            tuple[discord.Message, int]: The message being edited and its offset after rendering.
         """
-        response = await self.llm_services.get_oai_reply(prompt=prompt, image_urls=attachments)
-        # 假設回傳格式: response.choices[0].message.content
-        return response.choices[0].message.content
+        while len(text) - offset > DISCORD_MESSAGE_LIMIT:
+            await msg.edit(content=text[offset : offset + DISCORD_MESSAGE_LIMIT])
+            offset += DISCORD_MESSAGE_LIMIT
+            msg = await ctx.send("總結中...")
+        if text[offset:]:
+            await msg.edit(content=text[offset:])
+        return msg, offset
 
 
 async def setup(bot: commands.Bot) -> None:
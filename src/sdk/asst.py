@@ -5,14 +5,15 @@ from openai import OpenAI
 from pydantic import Field, ConfigDict, computed_field
 from openai.pagination import SyncCursorPage
 from openai.types.beta import Thread, Assistant, ThreadDeleted, AssistantDeleted
+from pydantic_settings import BaseSettings
 from openai.types.beta.threads import Run, Message, MessageDeleted
 from autogen.agentchat.contrib.img_utils import get_pil_image, pil_to_data_uri
 
-from src.types.config import Config
+from src.types.config import Config, get_config
 from src.types.database import DatabaseConfig
 
 
-class AssistantAPI(Config):
+class AssistantAPI(BaseSettings):
     model_config = ConfigDict(arbitrary_types_allowed=True)
     thread_id: Optional[str] = Field(default=None)
     assistant_id: Optional[str] = Field(default=None)
@@ -20,10 +21,14 @@ class AssistantAPI(Config):
     metadata: dict[str, str] = Field(default={"backend_id": "default"})
     db: DatabaseConfig = Field(default_factory=DatabaseConfig)
 
+    @property
+    def config(self) -> Config:
+        return get_config()
+
     @computed_field
     @property
     def client(self) -> OpenAI:
-        client = OpenAI(api_key=self.openai_api_key, base_url="https://api.openai.com/v1")
+        client = OpenAI(api_key=self.config.openai_api_key, base_url="https://api.openai.com/v1")
         return client
 
     def create_or_retrieve_thread(self) -> Thread:
@@ -0,0 +1,94 @@
+from typing import Optional
+import hashlib
+from collections import OrderedDict
+from collections.abc import Hashable
+
+import numpy as np
+
+
+class SummaryCache:
+    """An LRU response cache with exact-key lookup and embedding-based near-hit lookup.
+
+    Exact hits are served from an in-memory dict keyed by a SHA-256 digest, while near-hits
+    are found by cosine similarity between the stored prompt embeddings and the query embedding.
+    Near-hits are only searched within the same scope (e.g. the same channel, user, message
+    count and newest message), so cached summaries never leak across requests that differ in
+    those parts.
+    Entries stored without an embedding can only be found by their exact key.
+    """
+
+    def __init__(self, maxsize: int = 512, threshold: float = 0.95):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self._entries: OrderedDict[str, tuple[Hashable, Optional[np.ndarray], str]] = OrderedDict()
+
+    @staticmethod
+    def make_key(*parts: object) -> str:
+        """Builds an exact-match cache key from the given parts.
+
+        Args:
+            *parts (object): The values identifying a request, e.g. channel id and message id.
+
+        Returns:
+            str: The SHA-256 hex digest of the joined parts.
+        """
+        raw = "|".join(str(part) for part in parts)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached value for an exact key, or None on miss."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[2]
+
+    def has_scope(self, scope: Hashable = None) -> bool:
+        """Returns whether any entry of the given scope can be found by a near-hit search."""
+        return any(
+            entry_scope == scope and vector is not None
+            for entry_scope, vector, _ in self._entries.values()
+        )
+
+    def search(self, embedding: list[float], scope: Hashable = None) -> Optional[str]:
+        """Returns the cached value whose embedding is the closest to the given one.
+
+        Args:
+            embedding (list[float]): The embedding of the prompt to look up.
+            scope (Hashable, optional): Only entries stored with the same scope are searched.
+
+        Returns:
+            Optional[str]: The cached value if its cosine similarity reaches the threshold.
+        """
+        keys = [
+            key
+            for key, (entry_scope, vector, _) in self._entries.items()
+            if entry_scope == scope and vector is not None
+        ]
+        if not keys:
+            return None
+        matrix = np.stack([self._entries[key][1] for key in keys])
+        scores = matrix @ self._normalize(embedding)
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        return self.get(keys[best])
+
+    def put(
+        self, key: str, embedding: Optional[list[float]], value: str, scope: Hashable = None
+    ) -> None:
+        """Stores a value and evicts the least recently used entry when the cache is full.
+
+        Pass None as the embedding to store a value that is only found by its exact key.
+        """
+        vector = self._normalize(embedding) if embedding is not None else None
+        self._entries[key] = (scope, vector, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    def _normalize(embedding: list[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
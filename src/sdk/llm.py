@@ -1,13 +1,17 @@
+import re
 from typing import TYPE_CHECKING, Any, Optional
+import asyncio
+import functools
 from collections.abc import AsyncGenerator
 
 from openai import AsyncOpenAI
-from pydantic import Field, ConfigDict, computed_field
+from pydantic import Field, ConfigDict, PrivateAttr, computed_field
 from openai.types.chat import ChatCompletion, ChatCompletionChunk
+from pydantic_settings import BaseSettings
 from openai.types.images_response import ImagesResponse
 from autogen.agentchat.contrib.img_utils import get_pil_image, pil_to_data_uri
 
-from src.types.config import Config
+from src.types.config import Config, get_config
 
 if TYPE_CHECKING:
     from openai._streaming import AsyncStream
@@ -36,8 +40,18 @@ SYSTEM_PROMPT = "你是一個有用的Discord機器人, Mai 創造你的目的
 # 勝者為王 敗者為寇
 # """
 
+# 批次請求：在 BATCH_WINDOW 秒內或累積到 BATCH_MAX_SIZE 筆時，合併成一次 LLM 呼叫
+BATCH_WINDOW = 0.05
+BATCH_MAX_SIZE = 8
+BATCH_DELIMITER = "===REQUEST {index}==="
+BATCH_PATTERN = re.compile(r"^===REQUEST (\d+)===[ \t]*$", re.MULTILINE)
+BATCH_INSTRUCTION = """
+以下有 {count} 個彼此獨立的請求，每個請求前都有一行分隔標記，例如 ===REQUEST 0===。
+請分別回覆每一個請求，並在每個回覆前加上與該請求相同的分隔標記，分隔標記須獨立成一行。
+"""
 
-class LLMServices(Config):
+
+class LLMServices(BaseSettings):
     model_config = ConfigDict(arbitrary_types_allowed=True)
     llm_model: str = Field(
         default="gpt-4o",
@@ -51,13 +65,55 @@ class LLMServices(Config):
         description="This model should be OpenAI Model.",
         alias="graph_model",
     )
+    embedding_model: str = Field(
+        default="text-embedding-3-small",
+        title="Embedding Model Selection",
+        description="This model should be OpenAI Model.",
+        alias="embedding_model",
+    )
     system_prompt: str = Field(default=SYSTEM_PROMPT)
+    prompt_cache_key: Optional[str] = Field(
+        default=None,
+        title="Prompt Cache Key",
+        description="Requests sharing this key and system prompt are routed to the same prompt cache.",
+    )
+
+    _client: Optional[AsyncOpenAI] = PrivateAttr(default=None)
+    _batch_queue: Optional[asyncio.Queue] = PrivateAttr(default=None)
+    _batch_tasks: set[asyncio.Task] = PrivateAttr(default_factory=set)
+    _batch_futures: set[asyncio.Future] = PrivateAttr(default_factory=set)
+
+    @property
+    def config(self) -> Config:
+        # 不作為設定欄位，避免 pydantic-settings 讀取名為 CONFIG 的環境變數
+        return get_config()
+
+    @classmethod
+    @functools.cache
+    def shared(cls) -> "LLMServices":
+        """Returns the process-wide instance, whose client and connection pool every cog reuses."""
+        return cls()
+
+    def with_system(
+        self, system_prompt: str, prompt_cache_key: Optional[str] = None
+    ) -> "LLMServices":
+        """Returns a copy using another system prompt that shares this instance's client."""
+        _ = self.client  # 先建立 client，讓複本共用同一個連線池
+        llm_services: LLMServices = self.model_copy(
+            update={"system_prompt": system_prompt, "prompt_cache_key": prompt_cache_key}
+        )
+        # 批次佇列綁定 system prompt，不能與原本的實例共用
+        llm_services._reset_batching()
+        return llm_services
 
     @computed_field
     @property
     def client(self) -> AsyncOpenAI:
-        client = AsyncOpenAI(api_key=self.openai_api_key, base_url="https://api.openai.com/v1")
-        return client
+        if self._client is None:
+            self._client = AsyncOpenAI(
+                api_key=self.config.openai_api_key, base_url="https://api.openai.com/v1"
+            )
+        return self._client
 
     @classmethod
     async def _get_llm_config(cls, config_dict: dict[str, Any]) -> dict[str, Any]:
@@ -69,20 +125,35 @@ class LLMServices(Config):
         }
         return llm_config
 
+    @property
+    def cache_options(self) -> dict[str, Any]:
+        if not self.prompt_cache_key:
+            return {}
+        return {"extra_body": {"prompt_cache_key": self.prompt_cache_key}}
+
     async def prepare_content(
         self, prompt: str, image_urls: Optional[list[str]] = None
     ) -> list[dict[str, Any]]:
         content: list[dict[str, Any]] = [{"type": "text", "text": prompt}]
         if not image_urls:
             return content
-        for image_url in image_urls:
-            image = get_pil_image(image_file=image_url)
-            image_base64 = pil_to_data_uri(image=image)
+        # 下載與 base64 編碼圖片都是阻塞操作，放到執行緒中同時處理，避免卡住 event loop
+        images_base64 = await asyncio.gather(*[
+            asyncio.to_thread(self._to_data_uri, image_url) for image_url in image_urls
+        ])
+        for image_base64 in images_base64:
             content.append({"type": "image_url", "image_url": {"url": image_base64}})
         return content
 
+    @staticmethod
+    def _to_data_uri(image_url: str) -> str:
+        image = get_pil_image(image_file=image_url)
+        return pil_to_data_uri(image=image)
+
     async def get_search_result(self, prompt: str) -> ChatCompletion:
-        client = AsyncOpenAI(api_key=self.pplx_api_key, base_url="https://api.perplexity.ai")
+        client = AsyncOpenAI(
+            api_key=self.config.pplx_api_key, base_url="https://api.perplexity.ai"
+        )
         response = await client.chat.completions.create(
             model="llama-3.1-sonar-large-128k-online",
             messages=[
@@ -106,8 +177,12 @@ class LLMServices(Config):
         )
         return response
 
+    async def get_embedding(self, text: str) -> list[float]:
+        response = await self.client.embeddings.create(model=self.embedding_model, input=text)
+        return response.data[0].embedding
+
     async def get_oai_reply(
-        self, prompt: str, image_urls: Optional[list[str]] = None
+        self, prompt: str, image_urls: Optional[list[str]] = None, max_tokens: Optional[int] = None
     ) -> ChatCompletion:
         content = await self.prepare_content(prompt, image_urls)
         completion = self.client.chat.completions.create(
@@ -116,20 +191,127 @@ class LLMServices(Config):
                 {"role": "system", "content": self.system_prompt},
                 {"role": "user", "content": content},
             ],
+            max_tokens=max_tokens,
+            **self.cache_options,
         )
         return await completion
 
+    async def get_oai_reply_batched(self, prompts: list[str]) -> list[str]:
+        """Answers several independent prompts with a single completion.
+
+        The prompts are joined with numbered delimiter lines and the reply is split on the same
+        delimiters. Prompts whose reply cannot be found are answered individually instead.
+
+        Args:
+            prompts (list[str]): The prompts to answer.
+
+        Returns:
+            list[str]: The replies, in the same order as the prompts.
+        """
+        if len(prompts) == 1:
+            response = await self.get_oai_reply(prompt=prompts[0])
+            return [response.choices[0].message.content]
+
+        batched_prompt = BATCH_INSTRUCTION.format(count=len(prompts)) + "\n".join(
+            f"{BATCH_DELIMITER.format(index=index)}\n{prompt}"
+            for index, prompt in enumerate(prompts)
+        )
+        response = await self.get_oai_reply(prompt=batched_prompt)
+        parts = BATCH_PATTERN.split(response.choices[0].message.content or "")
+        replies = {
+            int(index): reply.strip()
+            for index, reply in zip(parts[1::2], parts[2::2], strict=True)
+            if reply.strip()
+        }
+
+        missing = [index for index in range(len(prompts)) if index not in replies]
+        fallbacks = await asyncio.gather(*[
+            self.get_oai_reply(prompt=prompts[index]) for index in missing
+        ])
+        for index, fallback in zip(missing, fallbacks, strict=True):
+            replies[index] = fallback.choices[0].message.content
+        return [replies[index] for index in range(len(prompts))]
+
+    async def get_oai_reply_coalesced(self, prompt: str) -> str:
+        """Queues a prompt to be answered together with other prompts queued around the same time.
+
+        Args:
+            prompt (str): The prompt to answer.
+
+        Returns:
+            str: The reply to the prompt.
+        """
+        if self._batch_queue is None:
+            self._batch_queue = asyncio.Queue()
+            self._track_batch_task(asyncio.create_task(self._collect_batches(self._batch_queue)))
+        future: asyncio.Future[str] = asyncio.get_running_loop().create_future()
+        self._batch_futures.add(future)
+        future.add_done_callback(self._batch_futures.discard)
+        await self._batch_queue.put((prompt, future))
+        return await future
+
+    async def _collect_batches(self, queue: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + BATCH_WINDOW
+            while len(batch) < BATCH_MAX_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # 送出批次時不阻塞下一批的收集
+            self._track_batch_task(asyncio.create_task(self._flush_batch(batch)))
+
+    async def _flush_batch(self, batch: list[tuple[str, asyncio.Future]]) -> None:
+        try:
+            replies = await self.get_oai_reply_batched([prompt for prompt, _ in batch])
+            for (_, future), reply in zip(batch, replies, strict=True):
+                if not future.done():
+                    future.set_result(reply)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            # 被取消時 CancelledError 不會進入 except，仍要讓等待中的呼叫者結束
+            for _, future in batch:
+                if not future.done():
+                    future.cancel()
+
+    def stop_batching(self) -> None:
+        """Cancels the background batching tasks; pending coalesced replies are cancelled too."""
+        for task in list(self._batch_tasks):
+            task.cancel()
+        # 仍在佇列中或收集到一半的請求不屬於任何 flush task，需要直接取消
+        for future in list(self._batch_futures):
+            future.cancel()
+        self._reset_batching()
+
+    def _reset_batching(self) -> None:
+        self._batch_queue = None
+        self._batch_tasks = set()
+        self._batch_futures = set()
+
+    def _track_batch_task(self, task: asyncio.Task) -> None:
+        self._batch_tasks.add(task)
+        task.add_done_callback(self._batch_tasks.discard)
+
     async def get_oai_reply_stream(
         self, prompt: str, image_urls: Optional[list[str]] = None
     ) -> AsyncGenerator[ChatCompletionChunk, None]:
         content = await self.prepare_content(prompt, image_urls)
-        completion: AsyncStream[ChatCompletionChunk] = self.client.chat.completions.create(
+        completion: AsyncStream[ChatCompletionChunk] = await self.client.chat.completions.create(
             model=self.llm_model,
             messages=[
                 {"role": "system", "content": self.system_prompt},
                 {"role": "user", "content": content},
             ],
             stream=True,
+            **self.cache_options,
         )
         async for chunk in completion:
             if len(chunk.choices) > 0:
@@ -137,8 +319,6 @@ class LLMServices(Config):
 
 
 if __name__ == "__main__":
-    import asyncio
-
     from rich.console import Console
 
     console = Console()
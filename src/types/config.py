@@ -1,32 +1,47 @@
+import os
+from typing import Optional
+import functools
+from dataclasses import dataclass
+
 import logfire
-from pydantic import Field
-from pydantic_settings import BaseSettings
 
 logfire.configure(send_to_logfire=False)
 
 
-class Config(BaseSettings):
-    openai_api_key: str = Field(
-        ...,
-        description="The api key from openai for calling models.",
-        examples=["sk-proj-..."],
-        alias="OPENAI_API_KEY",
-        frozen=False,
-        deprecated=False,
-    )
-    pplx_api_key: str = Field(
-        ...,
-        description="The api key from perplexity for calling models.",
-        examples=["pplx-..."],
-        alias="PERPLEXITY_API_KEY",
-        frozen=False,
-        deprecated=False,
-    )
-    discord_bot_token: str = Field(
-        ...,
-        description="The token from discord for calling models.",
-        examples=["MTEz-..."],
-        alias="DISCORD_BOT_TOKEN",
-        frozen=False,
-        deprecated=False,
+@dataclass(frozen=True, slots=True)
+class Config:
+    """API keys and tokens read from the environment.
+
+    Attributes:
+        openai_api_key (str): The api key from openai for calling models, e.g. `sk-proj-...`.
+            Read from `OPENAI_API_KEY`.
+        pplx_api_key (str): The api key from perplexity for calling models, e.g. `pplx-...`.
+            Read from `PERPLEXITY_API_KEY`.
+        discord_bot_token (str): The token from discord for calling models, e.g. `MTEz-...`.
+            Read from `DISCORD_BOT_TOKEN`.
+        huggingface_api_token (Optional[str]): The token from huggingface for the inference API.
+            Read from `HUGGINGFACE_API_TOKEN`, optional.
+    """
+
+    openai_api_key: str
+    pplx_api_key: str
+    discord_bot_token: str
+    huggingface_api_token: Optional[str] = None
+
+
+def _require_env(name: str) -> str:
+    try:
+        return os.environ[name]
+    except KeyError:
+        raise KeyError(f"Missing required environment variable: {name}") from None
+
+
+@functools.cache
+def get_config() -> Config:
+    """Reads the config from the environment once and returns the same instance afterwards."""
+    return Config(
+        openai_api_key=_require_env("OPENAI_API_KEY"),
+        pplx_api_key=_require_env("PERPLEXITY_API_KEY"),
+        discord_bot_token=_require_env("DISCORD_BOT_TOKEN"),
+        huggingface_api_token=os.environ.get("HUGGINGFACE_API_TOKEN"),
     )
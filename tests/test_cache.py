@@ -0,0 +1,55 @@
+from src.sdk.cache import SummaryCache
+
+
+def test_make_key_is_stable() -> None:
+    assert SummaryCache.make_key(1, 2, None) == SummaryCache.make_key(1, 2, None)
+    assert SummaryCache.make_key(1, 2, None) != SummaryCache.make_key(1, 2, 3)
+
+
+def test_get_exact_hit() -> None:
+    cache = SummaryCache()
+    cache.put("key", [1.0, 0.0], "summary")
+    assert cache.get("key") == "summary"
+    assert cache.get("missing") is None
+
+
+def test_search_near_hit_threshold() -> None:
+    cache = SummaryCache(threshold=0.95)
+    cache.put("key", [1.0, 0.0], "summary", scope="channel")
+    assert cache.search([0.99, 0.01], scope="channel") == "summary"
+    assert cache.search([0.5, 0.5], scope="channel") is None
+
+
+def test_search_is_isolated_by_scope() -> None:
+    cache = SummaryCache()
+    cache.put("key", [1.0, 0.0], "summary", scope=(1, None, 20))
+    assert cache.search([1.0, 0.0], scope=(1, None, 20)) == "summary"
+    assert cache.search([1.0, 0.0], scope=(1, 42, 20)) is None
+    assert cache.search([1.0, 0.0], scope=(1, None, 10)) is None
+
+
+def test_put_without_embedding_is_exact_only() -> None:
+    cache = SummaryCache()
+    cache.put("key", None, "summary", scope="channel")
+    assert cache.get("key") == "summary"
+    assert cache.search([1.0, 0.0], scope="channel") is None
+
+
+def test_put_evicts_least_recently_used() -> None:
+    cache = SummaryCache(maxsize=2)
+    cache.put("a", [1.0, 0.0], "A")
+    cache.put("b", [0.0, 1.0], "B")
+    assert cache.get("a") == "A"
+    cache.put("c", [1.0, 1.0], "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+
+
+def test_has_scope_ignores_entries_without_embedding() -> None:
+    cache = SummaryCache()
+    cache.put("a", None, "A", scope="channel")
+    assert not cache.has_scope("channel")
+    cache.put("b", [1.0, 0.0], "B", scope="channel")
+    assert cache.has_scope("channel")
+    assert not cache.has_scope("other")
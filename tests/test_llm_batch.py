@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+import asyncio
+
+import pytest
+from src.sdk.llm import BATCH_PATTERN, LLMServices
+
+
+def make_completion(content: str) -> SimpleNamespace:
+    message = SimpleNamespace(content=content)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+@pytest.fixture
+def prompts_sent(monkeypatch: pytest.MonkeyPatch) -> list[str]:
+    """Replaces get_oai_reply with a fake that answers every request found in the prompt."""
+    sent: list[str] = []
+
+    async def get_oai_reply(self: LLMServices, prompt: str) -> SimpleNamespace:
+        sent.append(prompt)
+        parts = BATCH_PATTERN.split(prompt)
+        if len(parts) == 1:
+            return make_completion(f"reply to {prompt}")
+        # 只回覆偶數編號的請求，模擬模型漏掉部分分隔標記
+        return make_completion(
+            "\n".join(
+                f"===REQUEST {index}===\nreply to {request.strip()}"
+                for index, request in zip(parts[1::2], parts[2::2], strict=True)
+                if int(index) % 2 == 0
+            )
+        )
+
+    monkeypatch.setattr(LLMServices, "get_oai_reply", get_oai_reply)
+    return sent
+
+
+async def test_get_oai_reply_batched_single_prompt(prompts_sent: list[str]) -> None:
+    replies = await LLMServices().get_oai_reply_batched(["a"])
+    assert replies == ["reply to a"]
+    assert prompts_sent == ["a"]
+
+
+async def test_get_oai_reply_batched_splits_and_falls_back(prompts_sent: list[str]) -> None:
+    replies = await LLMServices().get_oai_reply_batched(["a", "b", "c"])
+    assert replies == ["reply to a", "reply to b", "reply to c"]
+    # 一次批次呼叫，加上漏掉的 REQUEST 1 單獨補問
+    assert len(prompts_sent) == 2
+    assert prompts_sent[1] == "b"
+
+
+async def test_get_oai_reply_coalesced_merges_concurrent_prompts(prompts_sent: list[str]) -> None:
+    llm_services = LLMServices()
+    try:
+        replies = await asyncio.gather(
+            llm_services.get_oai_reply_coalesced("a"), llm_services.get_oai_reply_coalesced("c")
+        )
+    finally:
+        llm_services.stop_batching()
+    assert replies == ["reply to a", "reply to c"]
+    assert len(prompts_sent) == 2
+    assert "===REQUEST 0===\na\n===REQUEST 1===\nc" in prompts_sent[0]
+
+
+async def test_stop_batching_cancels_queued_prompts(prompts_sent: list[str]) -> None:
+    llm_services = LLMServices()
+    reply = asyncio.create_task(llm_services.get_oai_reply_coalesced("a"))
+    await asyncio.sleep(0)
+    llm_services.stop_batching()
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(reply, timeout=1)
+    assert prompts_sent == []
+
+
+async def test_stop_batching_cancels_prompts_being_flushed(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    flushing = asyncio.Event()
+
+    async def get_oai_reply_batched(self: LLMServices, prompts: list[str]) -> list[str]:
+        flushing.set()
+        await asyncio.Event().wait()
+        return prompts
+
+    monkeypatch.setattr(LLMServices, "get_oai_reply_batched", get_oai_reply_batched)
+    llm_services = LLMServices()
+    reply = asyncio.create_task(llm_services.get_oai_reply_coalesced("a"))
+    await asyncio.wait_for(flushing.wait(), timeout=1)
+    llm_services.stop_batching()
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(reply, timeout=1)
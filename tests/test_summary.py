@@ -0,0 +1,483 @@
+from types import SimpleNamespace
+from datetime import datetime, timedelta
+from collections import OrderedDict
+from collections.abc import Iterator, AsyncIterator
+
+import pytest
+import discord
+from src.cogs import summary
+from src.sdk.cache import SummaryCache
+from src.cogs.summary import (
+    ARGS_PATTERN,
+    MessageFetcher,
+    _get_encoding,
+    _format_message,
+    _history_token_budget,
+    _split_by_token_budget,
+)
+
+
+class CharEncoding:
+    """Counts one token per character, so budgets are easy to reason about."""
+
+    def encode(self, text: str) -> list[str]:
+        return list(text)
+
+
+class FakeLLMServices:
+    def __init__(self, reply: str) -> None:
+        self.reply = reply
+        self.calls: list[dict] = []
+
+    async def get_oai_reply(self, prompt: str, max_tokens: int | None = None) -> SimpleNamespace:
+        self.calls.append({"prompt": prompt, "max_tokens": max_tokens})
+        message = SimpleNamespace(content=self.reply)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+@pytest.fixture
+def char_encoding(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(summary, "_get_encoding", CharEncoding)
+
+
+class FakeMessage:
+    def __init__(self, content: str) -> None:
+        self.content = content
+        self.edits: list[str] = []
+
+    async def edit(self, content: str) -> None:
+        self.content = content
+        self.edits.append(content)
+
+
+class FakeContext:
+    def __init__(self, *mentions: SimpleNamespace) -> None:
+        self.message = SimpleNamespace(mentions=list(mentions))
+        self.sent: list[str] = []
+        self.messages: list[FakeMessage] = []
+
+    async def send(self, content: str) -> FakeMessage:
+        self.sent.append(content)
+        self.messages.append(FakeMessage(content))
+        return self.messages[-1]
+
+
+class FakeStreamServices:
+    """Streams the given text pieces as chat completion chunks."""
+
+    def __init__(self, pieces: list[str | None]) -> None:
+        self.pieces = pieces
+
+    async def get_oai_reply_stream(
+        self, prompt: str, image_urls: list[str] | None = None
+    ) -> AsyncIterator[SimpleNamespace]:
+        for piece in self.pieces:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+
+@pytest.fixture
+def fetcher() -> MessageFetcher:
+    return MessageFetcher.__new__(MessageFetcher)
+
+
+@pytest.mark.usefixtures("char_encoding")
+def test_split_by_token_budget_keeps_everything_within_budget() -> None:
+    lines = ["aaaa", "bbbb"]
+    assert _split_by_token_budget(lines, 10) == ([], lines)
+
+
+@pytest.mark.usefixtures("char_encoding")
+def test_split_by_token_budget_keeps_newest_lines() -> None:
+    # 每行 4 個字元加上換行各算 5 個 token
+    lines = ["aaaa", "bbbb", "cccc", "dddd"]
+    assert _split_by_token_budget(lines, 10) == (["aaaa", "bbbb"], ["cccc", "dddd"])
+
+
+@pytest.mark.usefixtures("char_encoding")
+def test_split_by_token_budget_always_keeps_newest_line() -> None:
+    lines = ["aaaa", "b" * 20]
+    assert _split_by_token_budget(lines, 10) == (["aaaa"], ["b" * 20])
+
+
+@pytest.mark.usefixtures("char_encoding")
+async def test_fit_token_budget_returns_history_within_budget(
+    monkeypatch: pytest.MonkeyPatch, fetcher: MessageFetcher
+) -> None:
+    monkeypatch.setattr(summary, "_history_token_budget", lambda: 100)
+    fetcher.overflow_llm_services = FakeLLMServices("unused")
+    result = await fetcher._fit_token_budget(["a: hi", "b: hello"])  # noqa: SLF001
+    assert result == "a: hi\nb: hello"
+    assert fetcher.overflow_llm_services.calls == []
+
+
+@pytest.mark.usefixtures("char_encoding")
+async def test_fit_token_budget_summarizes_whole_overflow_messages(
+    monkeypatch: pytest.MonkeyPatch, fetcher: MessageFetcher
+) -> None:
+    monkeypatch.setattr(summary, "_history_token_budget", lambda: 60)
+    monkeypatch.setattr(summary, "OVERFLOW_SUMMARY_TOKENS", 10)
+    fetcher.overflow_llm_services = FakeLLMServices("x" * 10)
+    chat_history = ["a: first\nstill first", "b: " + "m" * 20, "c: " + "n" * 20]
+
+    result = await fetcher._fit_token_budget(chat_history)  # noqa: SLF001
+
+    assert result == f"{summary.OVERFLOW_SUMMARY_HEADER}\n{'x' * 10}\n{chat_history[2]}"
+    assert len(result) <= 60
+    [call] = fetcher.overflow_llm_services.calls
+    assert call["max_tokens"] == 10
+    # 多行訊息整則移入較早的對話，不會從中間被切開
+    assert "a: first\nstill first\nb: " in call["prompt"]
+
+
+@pytest.mark.parametrize(
+    ("prompt", "count", "other"),
+    [
+        ("", None, None),
+        ("10", "10", None),
+        ("10 <@1>", "10", None),
+        ("<@1> 10", "10", None),
+        ("<@!1> <@2> 5", "5", None),
+        ("<@1>", None, None),
+        ("abc", None, "abc"),
+        ("<@1> abc", None, "abc"),
+        ("10abc", None, "10abc"),
+    ],
+)
+def test_args_pattern(prompt: str, count: str | None, other: str | None) -> None:
+    match = ARGS_PATTERN.match(prompt)
+    assert (match["count"], match["other"]) == (count, other)
+
+
+async def test_parse_args_ignores_mentions_not_in_prompt(fetcher: MessageFetcher) -> None:
+    # 回覆訊息時，被回覆者會出現在 mentions 但不在指令參數中
+    replied = SimpleNamespace(id=1)
+    ctx = FakeContext(replied)
+    assert await fetcher._parse_args(ctx, "10") == (10, [])  # noqa: SLF001
+    assert ctx.sent == []
+
+
+async def test_parse_args_reads_count_after_mentions(fetcher: MessageFetcher) -> None:
+    first, second, replied = SimpleNamespace(id=1), SimpleNamespace(id=2), SimpleNamespace(id=3)
+    ctx = FakeContext(replied, second, first)
+    history_count, target_users = await fetcher._parse_args(ctx, "<@1> <@!2> 5")  # noqa: SLF001
+    assert history_count == 5
+    assert target_users == [first, second]
+    assert ctx.sent == []
+
+
+async def test_parse_args_warns_on_invalid_count(fetcher: MessageFetcher) -> None:
+    user = SimpleNamespace(id=1)
+    ctx = FakeContext(user)
+    assert await fetcher._parse_args(ctx, "<@1> abc") == (20, [user])  # noqa: SLF001
+    assert len(ctx.sent) == 1
+
+
+def make_message(embeds: list[SimpleNamespace], author_name: str = "Wei") -> SimpleNamespace:
+    return SimpleNamespace(
+        id=1,
+        edited_at=None,
+        content="https://example.com",
+        embeds=embeds,
+        attachments=[],
+        author=SimpleNamespace(name=author_name),
+    )
+
+
+def test_format_message_refreshes_late_embeds_and_renames(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(summary, "_FORMATTED_MESSAGES", OrderedDict())
+    assert _format_message(make_message([])) == ("Wei: https://example.com", ())
+
+    # 連結預覽由 Discord 事後補上，編輯時間不變
+    preview = SimpleNamespace(description="Example Domain")
+    assert _format_message(make_message([preview])) == (
+        "Wei: 嵌入內容: Example Domain",
+        ("Example Domain",),
+    )
+    assert _format_message(make_message([preview], author_name="Toudou")) == (
+        "Toudou: 嵌入內容: Example Domain",
+        ("Example Domain",),
+    )
+
+
+class FakeHistory:
+    def __init__(self, messages: list[SimpleNamespace]) -> None:
+        self.messages = iter(messages)
+
+    def __aiter__(self) -> "FakeHistory":
+        """Returns the iterator itself, like discord's HistoryIterator."""
+        return self
+
+    async def __anext__(self) -> SimpleNamespace:
+        """Returns the next message."""
+        try:
+            return next(self.messages)
+        except StopIteration:
+            raise StopAsyncIteration from None
+
+
+class FakeChannel:
+    """Yields its messages newest first, like channel.history(oldest_first=False)."""
+
+    def __init__(self, messages: list[SimpleNamespace]) -> None:
+        self.id = 1
+        self.messages = messages
+
+    def history(
+        self,
+        limit: int,
+        after: datetime | None = None,
+        before: datetime | None = None,
+        **_: object,
+    ) -> FakeHistory:
+        messages = [
+            msg
+            for msg in reversed(self.messages)
+            if (after is None or msg.created_at > after)
+            and (before is None or msg.created_at < before)
+        ]
+        return FakeHistory(messages[:limit])
+
+
+def make_chat_message(
+    msg_id: int,
+    author_id: int,
+    content: str = "hi",
+    bot: bool = False,
+    age: timedelta = timedelta(),
+) -> SimpleNamespace:
+    author = SimpleNamespace(id=author_id, name=f"user{author_id}", bot=bot)
+    return SimpleNamespace(
+        id=msg_id,
+        content=content,
+        author=author,
+        created_at=discord.utils.utcnow() - age,
+        edited_at=None,
+        embeds=[],
+        attachments=[],
+    )
+
+
+async def test_fetch_messages_returns_oldest_first(fetcher: MessageFetcher) -> None:
+    channel = FakeChannel([
+        make_chat_message(1, 1),
+        make_chat_message(2, 2, bot=True),
+        make_chat_message(3, 1, content="!sum 10"),
+        make_chat_message(4, 2),
+        make_chat_message(5, 1),
+    ])
+    messages = await fetcher._fetch_messages(channel, 5, None)  # noqa: SLF001
+    assert [msg.id for msg in messages] == [1, 4, 5]
+
+
+async def test_fetch_messages_filters_by_user(fetcher: MessageFetcher) -> None:
+    channel = FakeChannel([make_chat_message(index, index % 2) for index in range(1, 8)])
+    user = SimpleNamespace(id=1)
+    messages = await fetcher._fetch_messages(channel, 2, user, since=None)  # noqa: SLF001
+    assert [msg.id for msg in messages] == [5, 7]
+
+
+async def test_fetch_messages_falls_back_to_messages_before_window(
+    fetcher: MessageFetcher,
+) -> None:
+    month = timedelta(days=30)
+    channel = FakeChannel([
+        make_chat_message(1, 1, age=month),
+        make_chat_message(2, 1, age=month),
+        make_chat_message(3, 2),
+        make_chat_message(4, 1),
+    ])
+    user = SimpleNamespace(id=1)
+    messages = await fetcher._fetch_messages(channel, 3, user)  # noqa: SLF001
+    assert [msg.id for msg in messages] == [1, 2, 4]
+
+
+async def test_fetch_messages_prefers_messages_within_window(fetcher: MessageFetcher) -> None:
+    channel = FakeChannel(
+        [make_chat_message(1, 1, age=timedelta(days=30))]
+        + [make_chat_message(index, 1) for index in range(2, 4)]
+    )
+    user = SimpleNamespace(id=1)
+    messages = await fetcher._fetch_messages(channel, 2, user)  # noqa: SLF001
+    assert [msg.id for msg in messages] == [2, 3]
+
+
+def test_format_messages_dedupes_references(
+    monkeypatch: pytest.MonkeyPatch, fetcher: MessageFetcher
+) -> None:
+    monkeypatch.setattr(summary, "_FORMATTED_MESSAGES", OrderedDict())
+    image = SimpleNamespace(url="https://example.com/a.png")
+    messages = [
+        SimpleNamespace(
+            id=index,
+            edited_at=None,
+            content="look",
+            embeds=[],
+            attachments=[image],
+            author=SimpleNamespace(name="Wei"),
+        )
+        for index in range(2)
+    ]
+    chat_history, attachments = fetcher._format_messages(messages)  # noqa: SLF001
+    assert chat_history == ["Wei: 附件: https://example.com/a.png"] * 2
+    assert attachments == ["https://example.com/a.png"]
+
+
+async def test_send_summary_splits_long_summaries(fetcher: MessageFetcher) -> None:
+    ctx = FakeContext()
+    await fetcher._send_summary(ctx, "a" * (summary.DISCORD_MESSAGE_LIMIT + 1))  # noqa: SLF001
+    assert [len(content) for content in ctx.sent] == [summary.DISCORD_MESSAGE_LIMIT, 1]
+
+
+@pytest.mark.parametrize("empty", ["", "  \n", None])
+async def test_send_summary_reports_empty_summaries(
+    fetcher: MessageFetcher, empty: str | None
+) -> None:
+    ctx = FakeContext()
+    await fetcher._send_summary(ctx, empty)  # noqa: SLF001
+    assert ctx.sent == [summary.EMPTY_SUMMARY_MESSAGE]
+
+
+class FakeEmbeddingServices:
+    """Embeds every prompt to the same vector, so any searched entry is a near-hit."""
+
+    async def get_embedding(self, text: str) -> list[float]:
+        return [1.0, 0.0]
+
+
+@pytest.fixture
+def cached_fetcher(monkeypatch: pytest.MonkeyPatch, fetcher: MessageFetcher) -> MessageFetcher:
+    monkeypatch.setattr(summary, "_get_encoding", CharEncoding)
+    monkeypatch.setattr(summary, "_history_token_budget", lambda: 1000)
+    monkeypatch.setattr(summary, "_FORMATTED_MESSAGES", OrderedDict())
+    fetcher.summary_cache = SummaryCache()
+    fetcher.llm_services = FakeEmbeddingServices()
+    return fetcher
+
+
+async def cache_first_summary(fetcher: MessageFetcher, ctx: FakeContext) -> None:
+    request = await fetcher._prepare_summary(ctx, 3, None)  # noqa: SLF001
+    fetcher.summary_cache.put(request.cache_key, [1.0, 0.0], "old summary", scope=request.scope)
+
+
+async def test_prepare_summary_serves_unchanged_window(cached_fetcher: MessageFetcher) -> None:
+    ctx = FakeContext()
+    ctx.channel = FakeChannel([make_chat_message(index, 1) for index in range(1, 4)])
+    await cache_first_summary(cached_fetcher, ctx)
+
+    assert await cached_fetcher._prepare_summary(ctx, 3, None) is None  # noqa: SLF001
+    assert ctx.sent == ["old summary"]
+
+
+async def test_prepare_summary_does_not_serve_shifted_window(
+    cached_fetcher: MessageFetcher,
+) -> None:
+    messages = [make_chat_message(index, 1) for index in range(1, 4)]
+    ctx = FakeContext()
+    ctx.channel = FakeChannel(messages)
+    await cache_first_summary(cached_fetcher, ctx)
+
+    # 新訊息讓視窗往後移動，即使 embedding 幾乎相同也不能沿用舊總結
+    messages.append(make_chat_message(4, 2))
+    request = await cached_fetcher._prepare_summary(ctx, 3, None)  # noqa: SLF001
+    assert request is not None
+    assert "user2: hi" in request.prompt
+    assert ctx.sent == []
+
+
+async def test_prepare_summary_serves_near_hit_for_edits(cached_fetcher: MessageFetcher) -> None:
+    messages = [make_chat_message(index, 1) for index in range(1, 4)]
+    ctx = FakeContext()
+    ctx.channel = FakeChannel(messages)
+    await cache_first_summary(cached_fetcher, ctx)
+
+    messages[1].content = "hi!"
+    messages[1].edited_at = discord.utils.utcnow()
+    assert await cached_fetcher._prepare_summary(ctx, 3, None) is None  # noqa: SLF001
+    assert ctx.sent == ["old summary"]
+
+
+@pytest.fixture
+def fresh_encoding() -> Iterator[None]:
+    _get_encoding.cache_clear()
+    _history_token_budget.cache_clear()
+    yield
+    _get_encoding.cache_clear()
+    _history_token_budget.cache_clear()
+
+
+@pytest.mark.usefixtures("fresh_encoding")
+async def test_cog_load_falls_back_when_encoding_is_unavailable(
+    monkeypatch: pytest.MonkeyPatch, fetcher: MessageFetcher
+) -> None:
+    def encoding_for_model(model_name: str) -> None:
+        raise ConnectionError("offline")
+
+    monkeypatch.setattr(summary.tiktoken, "encoding_for_model", encoding_for_model)
+    await fetcher.cog_load()
+
+    assert _get_encoding().encode("總結") == ["總", "結"]
+    static_text = summary.SUMMARY_PROMPT + summary.SUMMARY_TEMPLATE.substitute(
+        history_count="", chat_history_string=""
+    )
+    assert _history_token_budget() == summary.INPUT_TOKEN_BUDGET - len(static_text)
+
+
+@pytest.fixture
+def stream_fetcher(monkeypatch: pytest.MonkeyPatch, fetcher: MessageFetcher) -> MessageFetcher:
+    # 每收到一段內容就更新訊息，方便檢查每次編輯的結果
+    monkeypatch.setattr(summary, "STREAM_EDIT_INTERVAL", 0)
+    return fetcher
+
+
+async def test_stream_llm_rolls_over_to_a_new_message(stream_fetcher: MessageFetcher) -> None:
+    limit = summary.DISCORD_MESSAGE_LIMIT
+    pieces = ["a" * (limit - 500), "b" * 1000]
+    stream_fetcher.llm_services = FakeStreamServices(pieces)
+    ctx = FakeContext()
+
+    result = await stream_fetcher._stream_llm(ctx, "prompt", [])  # noqa: SLF001
+
+    text = "".join(pieces)
+    assert result == text
+    assert [msg.content for msg in ctx.messages] == [text[:limit], text[limit:]]
+
+
+async def test_stream_llm_carries_offset_between_edits(stream_fetcher: MessageFetcher) -> None:
+    limit = summary.DISCORD_MESSAGE_LIMIT
+    stream_fetcher.llm_services = FakeStreamServices(["a" * (limit + 100), "b" * 10, "c" * 10])
+    ctx = FakeContext()
+
+    await stream_fetcher._stream_llm(ctx, "prompt", [])  # noqa: SLF001
+
+    first, second = ctx.messages
+    assert first.content == "a" * limit
+    # 之後的編輯只更新第二則訊息，內容從上限之後接續
+    assert second.edits == [
+        "a" * 100,
+        "a" * 100 + "b" * 10,
+        "a" * 100 + "b" * 10 + "c" * 10,
+        "a" * 100 + "b" * 10 + "c" * 10,
+    ]
+
+
+async def test_stream_llm_throttles_edits(
+    monkeypatch: pytest.MonkeyPatch, fetcher: MessageFetcher
+) -> None:
+    monkeypatch.setattr(summary, "STREAM_EDIT_INTERVAL", 3600)
+    fetcher.llm_services = FakeStreamServices(["a", "b", "c"])
+    ctx = FakeContext()
+
+    await fetcher._stream_llm(ctx, "prompt", [])  # noqa: SLF001
+
+    [msg] = ctx.messages
+    assert msg.edits == ["abc"]
+
+
+async def test_stream_llm_reports_empty_stream(stream_fetcher: MessageFetcher) -> None:
+    stream_fetcher.llm_services = FakeStreamServices([None, ""])
+    ctx = FakeContext()
+
+    assert await stream_fetcher._stream_llm(ctx, "prompt", []) == ""  # noqa: SLF001
+
+    [msg] = ctx.messages
+    assert msg.content == summary.EMPTY_SUMMARY_MESSAGE